@@ -1,7 +1,9 @@
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from langchain_groq import ChatGroq
 from tools.youtube_tool import search_youtube_videos
+from utils.turn_metrics import format_turn_metrics
 import os
+import time
 import streamlit as st
 
 # System prompt for the chatbot
@@ -72,7 +74,27 @@ def generate_response(user_input, emotion_label, groq_chat, chat_history):
         elif msg["role"] == "assistant":
             converted_messages.append(AIMessage(content=msg["content"]))
             
-    # Invoke the Groq client directly with the full history
-    response = groq_chat.invoke(converted_messages)
-    
-    return response.content
\ No newline at end of file
+    # Stream from the Groq client with the full history so time-to-first-token can be measured
+    start = time.perf_counter()
+    ttft = None
+    response = None
+    for chunk in groq_chat.stream(converted_messages):
+        if ttft is None and chunk.content:
+            ttft = time.perf_counter() - start
+        response = chunk if response is None else response + chunk
+    total = time.perf_counter() - start
+
+    # Report the same per-turn metrics as the Ollama backend for comparison.
+    # Token counts come from the usage Groq attaches to the last streamed chunk.
+    usage = (response.usage_metadata if response else None) or {}
+    completion_tokens = usage.get("output_tokens", 0)
+    generation_time = total - ttft if ttft is not None else None
+    print(format_turn_metrics("Groq", {
+        "ttft": ttft,
+        "tokens_per_sec": completion_tokens / generation_time if completion_tokens and generation_time else None,
+        "prompt_tokens": usage.get("input_tokens", 0),
+        "completion_tokens": completion_tokens,
+        "total": total,
+    }))
+
+    return response.content if response else ""
\ No newline at end of file
@@ -0,0 +1,329 @@
+"""
+Load test for the chat pipeline behind app.py.
+
+Drives N simulated sessions through the same steps as `handle_input` (generate_response,
+extract_query_from_response, search_youtube, text_to_speech), plus synthetic video and
+audio through EmotionProcessor and queued_audio_frames_callback. The LLM, YouTube and TTS
+backends are replaced with local stub servers with configurable latency.
+
+Run from the repository root:
+    python -m loadtest.run_load_test --concurrency 1 2 4 8 16 --turns 5 --llm-latency 0.8
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import resource
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from loadtest.stub_servers import StubProcess
+
+STAGES = ["video_frame", "audio_callback", "generate_response", "extract_query", "search_youtube", "text_to_speech", "turn"]
+
+USER_MESSAGES = [
+    "I've been feeling really anxious about work lately.",
+    "I can't sleep and I keep overthinking everything.",
+    "Today was actually pretty good, I went for a walk!",
+    "I feel lonely since I moved to a new city.",
+    "Can you suggest some music to help me relax?",
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the EmotiCare chat pipeline against local stub backends.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="Concurrent session counts to step through.")
+    parser.add_argument("--turns", type=int, default=5, help="Chat turns per session.")
+    parser.add_argument("--frames", type=int, default=10, help="Video frames per session per turn.")
+    parser.add_argument("--audio-frames", type=int, default=50, help="20 ms audio frames per session per turn.")
+    parser.add_argument("--frame-image", help="Image used as the video frame (e.g. a face photo) instead of noise.")
+    parser.add_argument("--no-media", action="store_true", help="Skip the video and audio stages.")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM latency in seconds.")
+    parser.add_argument("--youtube-latency", type=float, default=0.1, help="Stub YouTube latency in seconds.")
+    parser.add_argument("--tts-latency", type=float, default=0.2, help="Stub TTS latency in seconds per request.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency (0..jitter seconds) for every stub.")
+    parser.add_argument("--max-error-rate", type=float, default=0.01,
+                        help="Failed-turn rate above which a concurrency level counts as saturated.")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file for comparing runs.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's own debug prints.")
+    return parser.parse_args()
+
+def start_stubs(args):
+    """Starts the stub backends in their own process and points the app's clients at them."""
+    stubs = StubProcess(args.llm_latency, args.youtube_latency, args.tts_latency, args.jitter).start()
+
+    # Must be set before chatbot / tools.youtube_tool are imported
+    os.environ["GROQ_API_KEY"] = "stub"
+    os.environ["GROQ_API_BASE"] = stubs.urls["llm"]
+    os.environ["YOUTUBE_API_KEY"] = "stub"
+    os.environ["YOUTUBE_API_ENDPOINT"] = stubs.urls["youtube"] + "/"
+
+    # gTTS has no endpoint setting, so redirect its Google Translate URL to the stub
+    import gtts.tts
+    tts_url = stubs.urls["tts"]
+    gtts.tts._translate_url = lambda tld="com", path="": f"{tts_url}/{path}"
+    return stubs
+
+def make_video_frame(args):
+    import av
+    import cv2
+    import numpy as np
+    if args.frame_image:
+        img = cv2.resize(cv2.imread(args.frame_image), (640, 480))
+    else:
+        img = np.random.randint(0, 256, (480, 640, 3), dtype=np.uint8)
+    return av.VideoFrame.from_ndarray(img, format="bgr24")
+
+def make_audio_frame():
+    import av
+    import numpy as np
+    # 20 ms of 48 kHz mono audio, the shape WebRTC delivers
+    samples = (np.random.randn(1, 960) * 1000).astype(np.int16)
+    frame = av.AudioFrame.from_ndarray(samples, format="s16", layout="mono")
+    frame.sample_rate = 48000
+    return frame
+
+class Recorder:
+    """Collects per-stage latencies from all session threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {stage: [] for stage in STAGES}
+        self.failures = {stage: 0 for stage in STAGES}
+        self.errors = 0
+
+    @contextlib.contextmanager
+    def time(self, stage):
+        # Failed stages still record their latency, since they are often the slowest ones
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.samples[stage].append(elapsed)
+                if failed:
+                    self.failures[stage] += 1
+
+def run_session(session_id, args, app, recorder):
+    """One simulated user: streams media and sends chat turns like handle_input does."""
+    rng = random.Random(session_id)
+    chat_history = [{"role": "assistant", "content": "Hey there! How's your day been? 😊"}]
+    processor = app["EmotionProcessor"]() if not args.no_media else None
+    loop = asyncio.new_event_loop()
+
+    try:
+        for _ in range(args.turns):
+            try:
+                if processor:
+                    for _ in range(args.frames):
+                        with recorder.time("video_frame"):
+                            processor.recv(app["video_frame"])
+                    for _ in range(args.audio_frames):
+                        with recorder.time("audio_callback"):
+                            loop.run_until_complete(app["queued_audio_frames_callback"]([app["audio_frame"]]))
+                    # Hand the recording off like process_voice_from_webrtc does
+                    with app["audio_context"].lock:
+                        app["audio_context"].frames.clear()
+                    emotion_label = processor.get_emotion()
+                else:
+                    emotion_label = "Neutral"
+
+                with recorder.time("turn"):
+                    user_input = rng.choice(USER_MESSAGES)
+                    chat_history.append({"role": "user", "content": user_input})
+
+                    with recorder.time("generate_response"):
+                        full_response = app["generate_response"](user_input, emotion_label, app["groq_chat"], chat_history)
+                    chatbot_message = full_response.split("|||", 1)[0].strip()
+                    chat_history.append({"role": "assistant", "content": chatbot_message})
+
+                    with recorder.time("extract_query"):
+                        youtube_query = app["extract_query_from_response"](full_response)
+                    if youtube_query:
+                        with recorder.time("search_youtube"):
+                            videos = app["search_youtube"](youtube_query)
+                            # search_youtube reports failures in its result instead of raising
+                            if videos and "error" in videos[0]:
+                                raise RuntimeError(videos[0]["error"])
+
+                    with recorder.time("text_to_speech"):
+                        audio_fp = app["text_to_speech"](chatbot_message)
+                        if audio_fp is None:
+                            raise RuntimeError("text_to_speech failed")
+            except Exception as e:
+                with recorder.lock:
+                    recorder.errors += 1
+                if args.verbose:
+                    print(f"Session {session_id} error:", e)
+    finally:
+        loop.close()
+
+def current_rss_mb():
+    """Resident memory of this process in MB (Linux), falling back to the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+def run_level(concurrency, args, app):
+    """Runs `concurrency` sessions at once and returns throughput, stage latencies, CPU and memory."""
+    recorder = Recorder()
+    peak_rss = current_rss_mb()
+    done = threading.Event()
+
+    def sample_memory():
+        nonlocal peak_rss
+        while not done.wait(0.1):
+            peak_rss = max(peak_rss, current_rss_mb())
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+
+    usage_start = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(run_session, i, args, app, recorder) for i in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - start
+    usage_end = resource.getrusage(resource.RUSAGE_SELF)
+    done.set()
+    sampler.join()
+
+    cpu = (usage_end.ru_utime - usage_start.ru_utime) + (usage_end.ru_stime - usage_start.ru_stime)
+    attempted = concurrency * args.turns
+    completed = attempted - recorder.errors
+    return {
+        "concurrency": concurrency,
+        "turns": attempted,
+        "errors": recorder.errors,
+        "error_rate": recorder.errors / attempted if attempted else 0.0,
+        "wall_s": wall,
+        "throughput_turns_per_s": completed / wall if wall else 0.0,
+        "cpu_percent": 100 * cpu / wall if wall else 0.0,
+        "peak_rss_mb": peak_rss,
+        "stages": {
+            stage: {
+                "count": len(samples),
+                "failed": recorder.failures[stage],
+                "p50_ms": 1000 * percentile(samples, 50) if samples else None,
+                "p95_ms": 1000 * percentile(samples, 95) if samples else None,
+                "p99_ms": 1000 * percentile(samples, 99) if samples else None,
+            }
+            for stage, samples in recorder.samples.items()
+        },
+    }
+
+def find_saturation(results, max_error_rate):
+    """
+    The first concurrency level where adding sessions stops paying off: more than `max_error_rate`
+    of turns fail, throughput grows by less than 10% of the ideal linear gain, or p95 turn latency
+    more than doubles versus the first level.
+    """
+    base = results[0]
+    if base["error_rate"] > max_error_rate:
+        return base["concurrency"]
+    base_p95 = base["stages"]["turn"]["p95_ms"]
+    for previous, current in zip(results, results[1:]):
+        if current["error_rate"] > max_error_rate:
+            return current["concurrency"]
+        ideal_gain = previous["throughput_turns_per_s"] * (current["concurrency"] / previous["concurrency"] - 1)
+        actual_gain = current["throughput_turns_per_s"] - previous["throughput_turns_per_s"]
+        p95 = current["stages"]["turn"]["p95_ms"]
+        if ideal_gain > 0 and actual_gain < 0.1 * ideal_gain:
+            return current["concurrency"]
+        if base_p95 and p95 and p95 > 2 * base_p95:
+            return current["concurrency"]
+    return None
+
+def print_report(results, saturation):
+    def ms(value):
+        return "-" if value is None else f"{value:.1f}"
+
+    print()
+    print(f"{'sessions':>8} {'turns':>6} {'errors':>6} {'err %':>6} {'turns/s':>8} {'cpu %':>7} {'rss MB':>8}")
+    for r in results:
+        print(f"{r['concurrency']:>8} {r['turns']:>6} {r['errors']:>6} {100 * r['error_rate']:>6.1f} "
+              f"{r['throughput_turns_per_s']:>8.2f} {r['cpu_percent']:>7.1f} {r['peak_rss_mb']:>8.1f}")
+
+    for r in results:
+        print(f"\nStage latency (ms) at {r['concurrency']} sessions, including failed calls")
+        print(f"  {'stage':<18} {'count':>6} {'failed':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+        for stage, s in r["stages"].items():
+            if s["count"]:
+                print(f"  {stage:<18} {s['count']:>6} {s['failed']:>6} "
+                      f"{ms(s['p50_ms']):>9} {ms(s['p95_ms']):>9} {ms(s['p99_ms']):>9}")
+
+    print()
+    if saturation:
+        print(f"Saturation at {saturation} concurrent sessions.")
+    else:
+        print("No saturation within the tested concurrency levels.")
+
+def main():
+    args = parse_args()
+    stubs = start_stubs(args)
+    try:
+        results = run_levels(args)
+    finally:
+        stubs.stop()
+
+    saturation = find_saturation(results, args.max_error_rate)
+    print_report(results, saturation)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"args": vars(args), "results": results, "saturation": saturation}, f, indent=2)
+
+def run_levels(args):
+    """Imports the pipeline and runs every concurrency level against the running stubs."""
+    # Imported after the stubs are wired up because the clients are created at import time
+    from chatbot import initialize_chatbot, generate_response, extract_query_from_response, search_youtube
+    from utils.text_to_speech import text_to_speech
+    app = {
+        "groq_chat": initialize_chatbot(),
+        "generate_response": generate_response,
+        "extract_query_from_response": extract_query_from_response,
+        "search_youtube": search_youtube,
+        "text_to_speech": text_to_speech,
+    }
+    if not args.no_media:
+        from utils.webrtc_logic import EmotionProcessor, get_audio_context, queued_audio_frames_callback
+        app.update({
+            "EmotionProcessor": EmotionProcessor,
+            "queued_audio_frames_callback": queued_audio_frames_callback,
+            "video_frame": make_video_frame(args),
+            "audio_frame": make_audio_frame(),
+            "audio_context": get_audio_context(),
+        })
+        # Keep the shared audio context recording, as it is while a user holds the record button
+        with app["audio_context"].lock:
+            app["audio_context"].recording = True
+
+    results = []
+    for concurrency in args.concurrency:
+        print(f"Running {concurrency} concurrent sessions...", file=sys.stderr)
+        # The pipeline prints debug output on every call, which would dominate the run
+        with open(os.devnull, "w") as devnull:
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+                results.append(run_level(concurrency, args, app))
+    return results
+
+if __name__ == "__main__":
+    main()
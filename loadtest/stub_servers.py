@@ -0,0 +1,200 @@
+import json
+import time
+import base64
+import queue
+import random
+import threading
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Canned chatbot replies. Roughly half carry a YouTube query after `|||` like the real prompt asks for.
+LLM_REPLIES = [
+    "I'm really sorry you're going through this. It's completely okay to feel that way. 💙",
+    "That sounds like a lot to carry. Some calming music might help you unwind. ||| calming piano music",
+    "Thank you for sharing that with me. Would you like to talk more about what happened? 🤗",
+    "A short guided breathing exercise can help ground you right now. ||| 5 minute guided breathing exercise",
+]
+
+class StubServer:
+    """
+    Local HTTP server that stands in for an external backend during load tests.
+    Every request waits `latency` seconds (plus up to `jitter` seconds) before the handler replies.
+    """
+
+    def __init__(self, handler, latency=0.0, jitter=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._handler = handler
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub._handle(self)
+
+            def do_POST(self):
+                stub._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handle(self, request):
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+
+        status, content_type, payload = self._handler(request.path, body)
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(payload)))
+        request.end_headers()
+        request.wfile.write(payload)
+
+def llm_handler(path, body):
+    """
+    Answers Groq's OpenAI-compatible chat completions endpoint, streaming the reply
+    as server-sent events when the request asks for `stream`.
+    """
+    reply = random.choice(LLM_REPLIES)
+    prompt_tokens = len(body) // 4
+    completion_tokens = len(reply) // 4
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+    base = {
+        "id": f"chatcmpl-stub-{random.getrandbits(32):08x}",
+        "created": int(time.time()),
+        "model": "stub",
+        "system_fingerprint": "stub",
+    }
+
+    try:
+        stream = json.loads(body or b"{}").get("stream", False)
+    except ValueError:
+        stream = False
+
+    if not stream:
+        payload = {
+            **base,
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "logprobs": None,
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }
+        return 200, "application/json", json.dumps(payload).encode()
+
+    # One chunk per word, then a final chunk carrying Groq's usage block
+    events = []
+    for i, word in enumerate(reply.split(" ")):
+        delta = {"role": "assistant", "content": word} if i == 0 else {"content": " " + word}
+        events.append({**base, "object": "chat.completion.chunk",
+                       "choices": [{"index": 0, "delta": delta, "logprobs": None, "finish_reason": None}]})
+    events.append({**base, "object": "chat.completion.chunk",
+                   "choices": [{"index": 0, "delta": {}, "logprobs": None, "finish_reason": "stop"}],
+                   "x_groq": {"id": base["id"], "usage": usage}})
+    payload = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+    return 200, "text/event-stream", payload.encode()
+
+def youtube_handler(path, body):
+    """Answers the YouTube Data API `search.list` call with a handful of videos."""
+    items = [
+        {"id": {"kind": "youtube#video", "videoId": f"stub{i:07d}"}, "snippet": {"title": f"Stub video {i}"}}
+        for i in range(5)
+    ]
+    return 200, "application/json", json.dumps({"items": items}).encode()
+
+def make_tts_handler(audio_bytes=16384):
+    """
+    Answers gTTS's batchexecute call with `audio_bytes` of fake mp3 data,
+    in the same line format gTTS parses from Google Translate.
+    """
+    audio = base64.b64encode(random.randbytes(audio_bytes)).decode()
+    payload = ")]}'\n\n" + json.dumps(
+        [["wrb.fr", "jQ1olc", json.dumps([audio]), None, None, None, "generic"]], separators=(",", ":")
+    ) + "\n"
+
+    def tts_handler(path, body):
+        return 200, "application/json; charset=utf-8", payload.encode()
+
+    return tts_handler
+
+def _serve_stubs(latencies, jitter, ready, stop):
+    """Child process entry point: starts every stub, reports their URLs and serves until stopped."""
+    stubs = {
+        "llm": StubServer(llm_handler, latencies["llm"], jitter).start(),
+        "youtube": StubServer(youtube_handler, latencies["youtube"], jitter).start(),
+        "tts": StubServer(make_tts_handler(), latencies["tts"], jitter).start(),
+    }
+    ready.put({name: stub.url for name, stub in stubs.items()})
+    stop.wait()
+    for stub in stubs.values():
+        stub.stop()
+
+class StubProcess:
+    """
+    Runs the LLM, YouTube and TTS stubs in a separate process, so their request handling
+    is not counted in the CPU and memory measured for the pipeline under test.
+    """
+
+    def __init__(self, llm_latency=0.0, youtube_latency=0.0, tts_latency=0.0, jitter=0.0):
+        self.latencies = {"llm": llm_latency, "youtube": youtube_latency, "tts": tts_latency}
+        self.jitter = jitter
+        self.urls = {}
+        self._process = None
+        self._stop = None
+
+    def start(self, timeout=30.0):
+        context = multiprocessing.get_context("spawn")
+        ready = context.Queue()
+        self._stop = context.Event()
+        self._process = context.Process(
+            target=_serve_stubs, args=(self.latencies, self.jitter, ready, self._stop),
+            name="loadtest-stubs", daemon=True,
+        )
+        self._process.start()
+        try:
+            self.urls = ready.get(timeout=timeout)
+        except queue.Empty:
+            self.stop()
+            raise RuntimeError("Stub servers did not start")
+        return self
+
+    def stop(self):
+        if self._process is None:
+            return
+        self._stop.set()
+        self._process.join(5)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._process = None
@@ -5,10 +5,10 @@ from dotenv import load_dotenv
 import numpy as np
 from tensorflow.keras.models import load_model
 from tensorflow.keras.preprocessing import image
-import ollama  # Import Ollama
-import smtplib  # For email escalation
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import uuid
+from utils.ollama_session import OllamaSession  # Warm Ollama model and chat history
+from utils.turn_metrics import format_turn_metrics
+from utils.escalation_queue import EscalationNotifier  # For email escalation
 import speech_recognition as sr  # For voice input
 import pyttsx3  # For voice output
 
@@ -33,6 +33,44 @@ EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
 EMAIL_USER = os.getenv("EMAIL_USER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 ESCALATION_EMAIL = os.getenv("ESCALATION_EMAIL")  # Email to notify in case of escalation
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "true").lower() != "false"  # Disable for a local SMTP stub
+ESCALATION_OUTBOX_DIR = os.getenv("ESCALATION_OUTBOX_DIR", ".escalation_outbox")  # Unsent escalations survive restarts here
+
+def missing_email_settings():
+    """Returns the names of email settings that must be set for escalation to work."""
+    return [name for name, value in (("EMAIL_HOST", EMAIL_HOST), ("ESCALATION_EMAIL", ESCALATION_EMAIL)) if not value]
+
+@st.cache_resource
+def get_escalation_notifier():
+    """
+    Starts a single background notifier shared by all sessions.
+    It keeps one SMTP connection open and retries from its on-disk outbox.
+    Returns None if escalation email is not configured.
+    """
+    missing = missing_email_settings()
+    if missing:
+        print("Escalation email disabled, missing:", ", ".join(missing))
+        return None
+    notifier = EscalationNotifier(
+        EMAIL_HOST, EMAIL_PORT, EMAIL_USER, EMAIL_PASSWORD, ESCALATION_EMAIL,
+        outbox_dir=ESCALATION_OUTBOX_DIR, use_tls=EMAIL_USE_TLS,
+    )
+    notifier.start()
+    return notifier
+
+@st.cache_resource
+def get_ollama_session():
+    """
+    Loads the Ollama model once at startup and keeps it pinned in memory.
+    """
+    session = OllamaSession.from_env()
+    session.warm()
+    return session
+
+ollama_session = get_ollama_session()
+
+# Start the notifier right away so escalations left in the outbox are resent on startup
+escalation_notifier = get_escalation_notifier()
 
 # Streamlit app
 st.title("Mental Health Companion Chatbot")
@@ -40,11 +78,21 @@ st.title("Mental Health Companion Chatbot")
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# Identifies this chat session so repeat escalations can be batched together
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 if not st.session_state.messages:
     initial_message_content = "Hey there! How's your day been? \U0001F60A"
     initial_message = {"role": "assistant", "content": initial_message_content}
     st.session_state.messages.append(initial_message)
 
+# Exact messages sent to Ollama, reused every turn so only new tokens are evaluated
+if "ollama_history" not in st.session_state:
+    st.session_state.ollama_history = ollama_session.new_history() + [
+        {"role": m["role"], "content": m["content"]} for m in st.session_state.messages
+    ]
+
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
@@ -95,25 +143,15 @@ else:
 
 # Function to send escalation email
 def send_escalation_email(emotion, user_input):
+    # Queue the email instead of sending it inline so the chat turn never waits on SMTP
+    if escalation_notifier is None:
+        st.error(f"Escalation email is not configured. Set {', '.join(missing_email_settings())} in your .env file.")
+        return
     try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_USER
-        msg['To'] = ESCALATION_EMAIL
-        msg['Subject'] = f"Emotion Escalation: User is feeling {emotion}"
-        body = f"""
-        The user is currently feeling {emotion}.
-        Their recent input was: "{user_input}".
-        Please reach out to them as soon as possible.
-        """
-        msg.attach(MIMEText(body, 'plain'))
-
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_USER, ESCALATION_EMAIL, msg.as_string())
-        st.success(f"Escalation email sent to {ESCALATION_EMAIL}.")
+        if escalation_notifier.enqueue(st.session_state.session_id, emotion, user_input):
+            st.success(f"Escalation email queued for {ESCALATION_EMAIL}.")
     except Exception as e:
-        st.error(f"Failed to send email: {e}")
+        st.error(f"Failed to queue escalation email: {e}")
 
 # Function to get voice input
 def get_voice_input():
@@ -162,17 +200,19 @@ if st.button("🎤 Use Voice Input"):
             message_placeholder = st.empty()
             full_response = ""
 
-            compassionate_prompt = f"""You are a compassionate and empathetic AI assistant. A user has shared the following: '{user_input}'.The user is feeling '{emotion_label}'. Please respond in a way that is supportive, understanding, and validates their feelings. Use emotes to convey emotions. Offer helpful suggestions if appropriate, but prioritize being a good listener and showing genuine care. 😊"""
-
-            # Use Ollama's API to generate a response
-            response = ollama.generate(model="qwen2.5:0.5b", prompt=compassionate_prompt, stream=True)
-            
-            for chunk in response:
-                full_response += chunk['response']
+            # Stream from the warm Ollama model, reusing the conversation prefix
+            turn = ollama_session.stream_chat(st.session_state.ollama_history, user_input, emotion_label)
+            for fragment in turn:
+                full_response += fragment
                 message_placeholder.markdown(full_response + "▌")
 
             message_placeholder.markdown(full_response)
 
+            # Report time-to-first-token and tokens/sec for this turn
+            turn_metrics = format_turn_metrics("Ollama", turn.metrics)
+            print(turn_metrics)
+            st.caption(turn_metrics)
+
             # Convert the response to speech
             speak(full_response)
 
@@ -193,17 +233,19 @@ if prompt := st.chat_input("Talk to me..."):
         message_placeholder = st.empty()
         full_response = ""
 
-        compassionate_prompt = f"""You are a compassionate and empathetic AI assistant. A user has shared the following: '{prompt}'.The user is feeling '{emotion_label}'. Please respond in a way that is supportive, understanding, and validates their feelings. Use emotes to convey emotions. Offer helpful suggestions if appropriate, but prioritize being a good listener and showing genuine care. 😊"""
-
-        # Use Ollama's API to generate a response
-        response = ollama.generate(model="qwen2.5:0.5b", prompt=compassionate_prompt, stream=True)
-        
-        for chunk in response:
-            full_response += chunk['response']
+        # Stream from the warm Ollama model, reusing the conversation prefix
+        turn = ollama_session.stream_chat(st.session_state.ollama_history, prompt, emotion_label)
+        for fragment in turn:
+            full_response += fragment
             message_placeholder.markdown(full_response + "▌")
 
         message_placeholder.markdown(full_response)
 
+        # Report time-to-first-token and tokens/sec for this turn
+        turn_metrics = format_turn_metrics("Ollama", turn.metrics)
+        print(turn_metrics)
+        st.caption(turn_metrics)
+
         # Convert the response to speech
         speak(full_response)
 
@@ -0,0 +1,169 @@
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+import pytest
+
+from utils.escalation_queue import EscalationNotifier
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """Minimal in-process SMTP server that records every message it accepts."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=("127.0.0.1", 0)):
+        super().__init__(address, SMTPHandler)
+        self.messages = []
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 stub ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith("DATA"):
+                self.reply("354 end with <CRLF>.<CRLF>")
+                data = []
+                while (line := self.rfile.readline()) not in (b".\r\n", b""):
+                    data.append(line)
+                self.server.messages.append(b"".join(data).decode())
+                self.reply("250 queued")
+            elif command.startswith("QUIT"):
+                self.reply("221 bye")
+                return
+            else:
+                # EHLO, MAIL, RCPT, NOOP and RSET all just succeed
+                self.reply("250 ok")
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+@pytest.fixture
+def smtp():
+    server = SMTPStub().start()
+    yield server
+    server.close()
+
+def make_notifier(port, outbox_dir, **kwargs):
+    options = {"use_tls": False, "batch_window": 0.2, "backoff_base": 0.1, "backoff_max": 0.2}
+    options.update(kwargs)
+    return EscalationNotifier("127.0.0.1", port, None, None, "ops@example.com",
+                              outbox_dir=str(outbox_dir), **options)
+
+def test_sends_escalation_and_clears_outbox(smtp, tmp_path):
+    notifier = make_notifier(smtp.server_address[1], tmp_path)
+    notifier.start()
+    try:
+        assert notifier.enqueue("session-1", "Sad", "I need help")
+        assert wait_for(lambda: smtp.messages and notifier.pending() == 0)
+    finally:
+        notifier.stop()
+
+    assert len(smtp.messages) == 1
+    assert "Emotion Escalation: User is feeling Sad" in smtp.messages[0]
+    assert '"I need help"' in smtp.messages[0]
+
+def test_batches_escalations_per_session(smtp, tmp_path):
+    notifier = make_notifier(smtp.server_address[1], tmp_path, batch_window=0.5)
+    notifier.start()
+    try:
+        notifier.enqueue("session-1", "Sad", "I feel sad")
+        notifier.enqueue("session-1", "Fear", "I'm scared")
+        notifier.enqueue("session-2", "Angry", "I'm so angry")
+        assert wait_for(lambda: len(smtp.messages) == 2 and notifier.pending() == 0)
+    finally:
+        notifier.stop()
+
+    session_1 = next(message for message in smtp.messages if "session-1" in message)
+    assert '"I feel sad"' in session_1 and '"I\'m scared"' in session_1
+    assert "User is feeling Fear" in session_1
+
+def test_drops_exact_repeats(smtp, tmp_path):
+    notifier = make_notifier(smtp.server_address[1], tmp_path)
+    notifier.start()
+    try:
+        assert notifier.enqueue("session-1", "Sad", "help")
+        assert not notifier.enqueue("session-1", "Sad", "help")
+        assert notifier.enqueue("session-2", "Sad", "help")
+        assert wait_for(lambda: len(smtp.messages) == 2 and notifier.pending() == 0)
+    finally:
+        notifier.stop()
+
+    assert sum('"help"' in message for message in smtp.messages) == 2
+
+def test_retries_until_server_recovers(tmp_path):
+    port = free_port()
+    notifier = make_notifier(port, tmp_path)
+    notifier.start()
+    server = None
+    try:
+        notifier.enqueue("session-1", "Sad", "help")
+        # Let several attempts fail, well past the point where backoff is capped
+        time.sleep(1.5)
+        assert notifier.pending() == 1
+
+        server = SMTPStub(("127.0.0.1", port)).start()
+        assert wait_for(lambda: server.messages and notifier.pending() == 0)
+    finally:
+        notifier.stop()
+        if server:
+            server.close()
+
+def test_replays_outbox_on_start(smtp, tmp_path):
+    item = {"id": "abc123", "session_id": "session-1", "emotion": "Sad",
+            "user_input": "left over from last run", "created": time.time(), "attempts": 2}
+    (tmp_path / "abc123.json").write_text(json.dumps(item))
+    (tmp_path / "broken.json").write_text("{not json")
+
+    notifier = make_notifier(smtp.server_address[1], tmp_path)
+    notifier.start()
+    try:
+        assert wait_for(lambda: smtp.messages and notifier.pending() == 0)
+    finally:
+        notifier.stop()
+
+    assert '"left over from last run"' in smtp.messages[0]
+    assert os.path.exists(tmp_path / "broken.json.bad")
+
+def test_new_notifier_takes_over_outbox(smtp, tmp_path):
+    first = make_notifier(smtp.server_address[1], tmp_path)
+    first.start()
+    second = make_notifier(smtp.server_address[1], tmp_path)
+    second.start()
+    try:
+        assert not first._thread.is_alive()
+        second.enqueue("session-1", "Sad", "help")
+        assert wait_for(lambda: smtp.messages and second.pending() == 0)
+    finally:
+        second.stop()
+
+def test_requires_host_and_recipient(tmp_path):
+    with pytest.raises(ValueError, match="host, recipient"):
+        EscalationNotifier(None, 25, None, None, None, outbox_dir=str(tmp_path))
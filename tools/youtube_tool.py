@@ -1,13 +1,26 @@
 import os
+import threading
 from googleapiclient.discovery import build
+from googleapiclient.http import build_http
 from dotenv import load_dotenv
 
 # Access the YouTube API key
 load_dotenv()
 youtube_api_key = os.getenv("YOUTUBE_API_KEY")
+youtube_api_endpoint = os.getenv("YOUTUBE_API_ENDPOINT")  # Optional override, e.g. a local stub for load tests
 
 # Initialize YouTube API client
-youtube = build('youtube', 'v3', developerKey=youtube_api_key)
+client_options = {"api_endpoint": youtube_api_endpoint} if youtube_api_endpoint else None
+youtube = build('youtube', 'v3', developerKey=youtube_api_key, client_options=client_options)
+
+# httplib2 connections are not thread-safe and Streamlit runs each session on its own thread,
+# so every thread sends its requests through its own connection
+_thread_local = threading.local()
+
+def _get_http():
+    if not hasattr(_thread_local, "http"):
+        _thread_local.http = build_http()
+    return _thread_local.http
 
 def search_youtube_videos(query: str, max_results: int = 5) -> list:
     """
@@ -23,7 +36,7 @@ def search_youtube_videos(query: str, max_results: int = 5) -> list:
             type="video",  # Search for videos
             maxResults=max_results
         )
-        response = request.execute()
+        response = request.execute(http=_get_http())
 
         # Debugging: Print the raw API response
         print("YouTube API Response:", response)
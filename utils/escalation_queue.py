@@ -0,0 +1,315 @@
+import os
+import json
+import atexit
+import time
+import uuid
+import queue
+import smtplib
+import threading
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+# Fields every outbox entry must have to be resent
+OUTBOX_FIELDS = {"id", "session_id", "emotion", "user_input", "created", "attempts"}
+
+# The running notifier for each outbox directory. Only one may replay an outbox at a time,
+# or the same escalation would be emailed twice (e.g. after Streamlit clears its resource cache).
+_active_notifiers = {}
+_active_lock = threading.Lock()
+
+@atexit.register
+def _stop_active_notifiers():
+    with _active_lock:
+        notifiers = list(_active_notifiers.values())
+    for notifier in notifiers:
+        notifier.stop()
+
+class EscalationNotifier:
+    """
+    Sends escalation emails from a background thread so the chat turn never waits on SMTP.
+
+    Every escalation is written to an on-disk outbox before it is queued and only removed
+    once the email has been accepted, so pending notifications survive a restart.
+    Escalations for the same session that arrive close together are batched into one
+    email, and exact repeats within `dedup_window` seconds are dropped. Failed sends are
+    retried with exponential backoff, then every `backoff_max` seconds until they succeed.
+    """
+
+    def __init__(self, host, port, user, password, recipient, outbox_dir=".escalation_outbox",
+                 use_tls=True, batch_window=2.0, dedup_window=300.0,
+                 backoff_base=1.0, backoff_max=60.0, idle_timeout=60.0, timeout=10.0):
+        missing = [name for name, value in (("host", host), ("recipient", recipient)) if not value]
+        if missing:
+            raise ValueError(f"Escalation email is not configured: missing {', '.join(missing)}")
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.recipient = recipient
+        self.outbox_dir = outbox_dir
+        self.use_tls = use_tls
+        self.batch_window = batch_window
+        self.dedup_window = dedup_window
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self._queue = queue.Queue()
+        self._retry = []  # (due time, session_id, items) waiting for another attempt
+        self._recent = {}  # (session_id, emotion, user_input) -> time it was accepted
+        self._recent_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+        self._last_used = 0.0
+
+        os.makedirs(self.outbox_dir, exist_ok=True)
+
+    def start(self):
+        """Starts the worker thread and re-queues anything left in the outbox."""
+        if self._thread and self._thread.is_alive():
+            return
+
+        # Take over the outbox from any notifier that was abandoned without being stopped
+        key = os.path.abspath(self.outbox_dir)
+        with _active_lock:
+            previous = _active_notifiers.get(key)
+            _active_notifiers[key] = self
+        if previous is not None and previous is not self:
+            previous.stop(timeout=self.timeout + 5.0)
+
+        self._stop.clear()
+        for item in self._load_outbox():
+            self._queue.put(item)
+        self._start_worker()
+
+    def _start_worker(self):
+        self._thread = threading.Thread(target=self._run, name="escalation-notifier", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stops the worker. Unsent escalations stay in the outbox for the next start."""
+        self._stop.set()
+        with _active_lock:
+            key = os.path.abspath(self.outbox_dir)
+            if _active_notifiers.get(key) is self:
+                del _active_notifiers[key]
+        # The worker closes the SMTP connection itself on the way out
+        if self._thread:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                print("Escalation worker did not stop in time")
+
+    def enqueue(self, session_id, emotion, user_input):
+        """
+        Queues an escalation without blocking on SMTP.
+        Returns False if it was an exact repeat of a recent escalation for the session.
+        Raises OSError if the escalation could not be written to the outbox.
+        """
+        now = time.time()
+        key = (session_id, emotion, user_input)
+        item = {
+            "id": uuid.uuid4().hex,
+            "session_id": session_id,
+            "emotion": emotion,
+            "user_input": user_input,
+            "created": now,
+            "attempts": 0,
+        }
+        with self._recent_lock:
+            self._recent = {k: t for k, t in self._recent.items() if now - t < self.dedup_window}
+            if key in self._recent:
+                return False
+            # Only remember the escalation once it is persisted, so a failed write can be retried
+            self._write_outbox(item)
+            self._recent[key] = now
+
+        self._queue.put(item)
+
+        # Restart the worker if it died, so queued escalations are not silently stranded
+        if not self._stop.is_set() and self._thread and not self._thread.is_alive():
+            print("Escalation worker was not running, restarting it")
+            self._start_worker()
+        return True
+
+    def pending(self):
+        """Returns the number of escalations still waiting in the outbox."""
+        return len([name for name in os.listdir(self.outbox_dir) if name.endswith(".json")])
+
+    # Outbox persistence
+    def _outbox_path(self, item):
+        return os.path.join(self.outbox_dir, f"{item['id']}.json")
+
+    def _write_outbox(self, item):
+        # Write to a temporary file first so a crash never leaves a half-written entry
+        path = self._outbox_path(item)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(item, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _remove_outbox(self, item):
+        try:
+            os.remove(self._outbox_path(item))
+        except FileNotFoundError:
+            pass
+
+    def _load_outbox(self):
+        items = []
+        for name in sorted(os.listdir(self.outbox_dir)):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.outbox_dir, name)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    item = json.load(f)
+                missing = OUTBOX_FIELDS - set(item)
+                if missing:
+                    raise ValueError(f"missing fields {sorted(missing)}")
+                items.append(item)
+            except (OSError, ValueError, TypeError) as e:
+                # Move it aside so it neither blocks startup nor gets retried forever
+                print("Quarantining unreadable outbox entry:", name, e)
+                try:
+                    os.replace(path, path + ".bad")
+                except OSError:
+                    pass
+        return sorted(items, key=lambda item: item["created"])
+
+    # Worker
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                batch = self._collect_batch()
+                if batch:
+                    sessions = {}
+                    for item in batch:
+                        sessions.setdefault(item["session_id"], []).append(item)
+                    for session_id, items in sessions.items():
+                        self._deliver_safely(session_id, items)
+                self._retry_due()
+                if self._server and time.monotonic() - self._last_used > self.idle_timeout:
+                    self._disconnect()
+            except Exception as e:
+                # Keep the worker alive; anything unsent is still in the outbox or retry list
+                print("Escalation worker error:", e)
+                self._stop.wait(1.0)
+        self._disconnect()
+
+    def _collect_batch(self):
+        """Waits for one escalation, then keeps collecting for `batch_window` seconds."""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _retry_due(self):
+        now = time.monotonic()
+        due = [entry for entry in self._retry if entry[0] <= now]
+        self._retry = [entry for entry in self._retry if entry[0] > now]
+        for _, session_id, items in due:
+            self._deliver_safely(session_id, items)
+
+    def _deliver_safely(self, session_id, items):
+        """Delivers a batch, rescheduling it if anything unexpected goes wrong."""
+        try:
+            self._deliver(session_id, items)
+        except Exception as e:
+            print(f"Escalation for session {session_id} hit an unexpected error, retrying in {self.backoff_max:.1f}s:", e)
+            self._retry.append((time.monotonic() + self.backoff_max, session_id, items))
+
+    def _deliver(self, session_id, items):
+        try:
+            self._send(self._build_message(session_id, items))
+        except Exception as e:
+            # Drop the connection so the next attempt starts from a clean session
+            self._disconnect()
+            attempts = max(item["attempts"] for item in items) + 1
+            for item in items:
+                item["attempts"] = attempts
+            # Never give up while the process runs; SMTP outages can last a long time
+            delay = min(self.backoff_base * 2 ** min(attempts - 1, 30), self.backoff_max)
+            self._retry.append((time.monotonic() + delay, session_id, items))
+            print(f"Escalation email failed (attempt {attempts}), retrying in {delay:.1f}s:", e)
+            try:
+                for item in items:
+                    self._write_outbox(item)
+            except OSError as write_error:
+                print("Failed to update escalation outbox:", write_error)
+            return
+
+        for item in items:
+            self._remove_outbox(item)
+
+    def _build_message(self, session_id, items):
+        items = sorted(items, key=lambda item: item["created"])
+        emotion = items[-1]["emotion"]
+        msg = MIMEMultipart()
+        msg['From'] = self.user or ""
+        msg['To'] = self.recipient
+        msg['Subject'] = f"Emotion Escalation: User is feeling {emotion}"
+        lines = "\n".join(
+            f'        - [{time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(item["created"]))}] '
+            f'feeling {item["emotion"]}: "{item["user_input"]}"'
+            for item in items
+        )
+        body = f"""
+        The user is currently feeling {emotion}.
+        Their recent input was:
+{lines}
+        Please reach out to them as soon as possible.
+        (session {session_id})
+        """
+        msg.attach(MIMEText(body, 'plain'))
+        return msg
+
+    # SMTP connection handling
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        return server
+
+    def _disconnect(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            pass
+        self._server = None
+
+    def _connection(self):
+        """Returns the pooled SMTP connection, reconnecting if the server dropped it."""
+        if self._server is not None:
+            try:
+                status, _ = self._server.noop()
+                if status == 250:
+                    return self._server
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._disconnect()
+        self._server = self._connect()
+        return self._server
+
+    def _send(self, msg):
+        server = self._connection()
+        server.sendmail(self.user or "", self.recipient, msg.as_string())
+        self._last_used = time.monotonic()
@@ -0,0 +1,159 @@
+import os
+import time
+import ollama
+
+# The system prompt never changes between turns, so Ollama can reuse its KV cache
+# for it (and for the rest of the unchanged history) instead of re-evaluating it.
+# The detected emotion travels with each user message instead.
+SYSTEM_PROMPT = """You are a compassionate and empathetic AI assistant. Each user message starts with the emotion detected on the user's face in square brackets. Please respond in a way that is supportive, understanding, and validates their feelings. Use emotes to convey emotions. Offer helpful suggestions if appropriate, but prioritize being a good listener and showing genuine care. 😊"""
+
+def parse_keep_alive(value):
+    """
+    Converts an OLLAMA_KEEP_ALIVE style value into what the Ollama API expects.
+    Plain numbers are seconds (-1 keeps the model loaded forever), anything else is a duration like "30m".
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+def estimate_tokens(messages):
+    """Rough, deliberately high token estimate (3 characters per token plus per-message overhead)."""
+    return sum(len(message["content"]) // 3 + 4 for message in messages)
+
+class OllamaSession:
+    """
+    Keeps a local Ollama model warm and streams chat turns against it.
+
+    The model is loaded once at startup and pinned in memory with `keep_alive`.
+    Conversations are sent through the chat API with a fixed system prompt and the
+    exact history of previous turns, so every turn shares a prefix with the last one
+    and Ollama only evaluates the new tokens.
+
+    The context window is fixed with `num_ctx`. Before the history would overflow it,
+    the oldest whole turns are dropped down to half the window, so the prefix changes
+    once every several turns instead of Ollama truncating it differently on every turn.
+    """
+
+    def __init__(self, model="qwen2.5:0.5b", host=None, keep_alive=-1, system_prompt=SYSTEM_PROMPT,
+                 num_ctx=4096, reply_tokens=512):
+        self.model = model
+        self.keep_alive = keep_alive
+        self.system_prompt = system_prompt
+        self.num_ctx = num_ctx
+        self.reply_tokens = reply_tokens  # Room left in the window for the model's reply
+        self.client = ollama.Client(host=host)
+
+    @classmethod
+    def from_env(cls):
+        """Builds a session from OLLAMA_MODEL, OLLAMA_HOST, OLLAMA_KEEP_ALIVE and OLLAMA_NUM_CTX."""
+        return cls(
+            model=os.getenv("OLLAMA_MODEL", "qwen2.5:0.5b"),
+            host=os.getenv("OLLAMA_HOST"),
+            keep_alive=parse_keep_alive(os.getenv("OLLAMA_KEEP_ALIVE", "-1")),
+            num_ctx=int(os.getenv("OLLAMA_NUM_CTX", 4096)),
+        )
+
+    @property
+    def options(self):
+        # num_ctx must match on every call, or Ollama reloads the model with the new window
+        return {"num_ctx": self.num_ctx}
+
+    def warm(self):
+        """
+        Loads the model and evaluates the system prompt once so the first user turn is fast.
+        Returns the warm-up time in seconds, or None if the Ollama server is unreachable.
+        """
+        start = time.perf_counter()
+        try:
+            self.client.chat(
+                model=self.model,
+                messages=self.new_history(),
+                keep_alive=self.keep_alive,
+                options={**self.options, "num_predict": 1},
+            )
+        except Exception as e:
+            print("Ollama warm-up failed:", e)
+            return None
+        elapsed = time.perf_counter() - start
+        print(f"Ollama model {self.model} warmed in {elapsed:.2f}s")
+        return elapsed
+
+    def new_history(self):
+        """Returns the message list a new conversation starts from."""
+        return [{"role": "system", "content": self.system_prompt}]
+
+    def stream_chat(self, history, user_input, emotion_label):
+        """
+        Starts a chat turn. Iterate over the returned ChatTurn to receive response fragments;
+        once it is exhausted the turn is appended to `history` and `metrics` is filled in.
+        """
+        message = {"role": "user", "content": f"[{emotion_label}] {user_input}"}
+        self.trim_history(history, message)
+        return ChatTurn(self, history, message)
+
+    def trim_history(self, history, message):
+        """
+        Drops the oldest turns from `history` in place if sending it with `message` could
+        overflow the context window. The system prompt is always kept, and the history is
+        cut back to half the window so it does not need trimming again on the next turn.
+        """
+        budget = self.num_ctx - self.reply_tokens
+        if estimate_tokens(history + [message]) <= budget:
+            return
+
+        system, turns = history[:1], history[1:]
+        while turns and estimate_tokens(system + turns + [message]) > budget // 2:
+            # Drop a whole turn: the oldest message plus everything up to the next user message
+            turns = turns[1:]
+            while turns and turns[0]["role"] != "user":
+                turns = turns[1:]
+        history[:] = system + turns
+
+class ChatTurn:
+    """A single streamed chat turn along with its timing metrics."""
+
+    def __init__(self, session, history, message):
+        self.session = session
+        self.history = history
+        self.message = message
+        self.response = ""
+        self.metrics = {}
+
+    def __iter__(self):
+        start = time.perf_counter()
+        ttft = None
+        final = {}
+
+        stream = self.session.client.chat(
+            model=self.session.model,
+            messages=self.history + [self.message],
+            stream=True,
+            keep_alive=self.session.keep_alive,
+            options=self.session.options,
+        )
+        for chunk in stream:
+            content = chunk["message"]["content"]
+            if content:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                self.response += content
+                yield content
+            if chunk.get("done"):
+                final = chunk
+
+        # Only record the turn once it completed so the history stays a valid prefix
+        self.history.append(self.message)
+        self.history.append({"role": "assistant", "content": self.response})
+
+        # Ollama reports durations in nanoseconds
+        eval_duration = final.get("eval_duration") or 0
+        self.metrics = {
+            "ttft": ttft,
+            "tokens_per_sec": final.get("eval_count", 0) / (eval_duration / 1e9) if eval_duration else None,
+            "prompt_tokens": final.get("prompt_eval_count", 0),
+            "prompt_eval": (final.get("prompt_eval_duration") or 0) / 1e9,
+            "completion_tokens": final.get("eval_count", 0),
+            "load": (final.get("load_duration") or 0) / 1e9,
+            "total": time.perf_counter() - start,
+        }
@@ -0,0 +1,28 @@
+def format_turn_metrics(backend, metrics):
+    """
+    Formats per-turn latency metrics into a single line so the Ollama and Groq paths
+    can be compared side by side.
+    Expects the keys produced by OllamaSession and generate_response:
+        - ttft: Seconds until the first token arrived (None if unknown).
+        - tokens_per_sec: Generation speed of the completion.
+        - prompt_tokens / completion_tokens: Token counts for the turn.
+        - total: Wall-clock seconds for the whole turn.
+        - prompt_eval: Seconds spent evaluating the prompt (optional). It should drop after the
+          first turn when the conversation prefix is reused from the KV cache.
+        - load: Seconds spent loading the model (optional). A large value means it was not kept warm.
+    """
+    def seconds(value):
+        return "n/a" if value is None else f"{value:.2f}s"
+
+    tokens_per_sec = metrics.get("tokens_per_sec")
+    parts = [
+        f"TTFT {seconds(metrics.get('ttft'))}",
+        "n/a tok/s" if tokens_per_sec is None else f"{tokens_per_sec:.1f} tok/s",
+        f"prompt {metrics.get('prompt_tokens', 0)} tok"
+        + (f" ({seconds(metrics['prompt_eval'])})" if metrics.get("prompt_eval") is not None else ""),
+        f"completion {metrics.get('completion_tokens', 0)} tok",
+        f"total {seconds(metrics.get('total'))}",
+    ]
+    if metrics.get("load") is not None:
+        parts.append(f"load {seconds(metrics['load'])}")
+    return f"[{backend}] " + " · ".join(parts)